@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Set, Tuple
+import chess
+import chess.pgn
+import engine
+
+
+def read_games(path: str) -> Iterator[Tuple[int, chess.pgn.Game]]:
+    with open(path, encoding="utf-8", errors="replace") as pgn:
+        index = 0
+        while True:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                return
+            yield index, game
+            index += 1
+
+
+def analyze_game(index: int, headers: Dict[str, str], start_fen: str, moves: List[str],
+                 movetime: float, max_nodes: int, blunder_threshold: int) -> Dict:
+    # Every position is searched once, with the game so far as history; evals are from the side to move
+    results = [engine.search(start_fen, moves[:ply], movetime, max_nodes) for ply in range(len(moves) + 1)]
+
+    board = chess.Board(start_fen)
+    analysis = []
+    for ply, uci in enumerate(moves):
+        before, after = results[ply], results[ply + 1]
+        move = chess.Move.from_uci(uci)
+        # What the mover gives away compared with the engine's best line
+        loss = max(0, before.score + after.score)
+        white_eval = -after.score if board.turn == chess.WHITE else after.score
+        analysis.append({
+            "ply": ply + 1,
+            "move": board.san(move),
+            "eval_cp": white_eval,
+            "best_move": before.move,
+            "loss_cp": loss,
+            "blunder": loss >= blunder_threshold,
+            "depth": before.depth,
+        })
+        board.push(move)
+
+    return {"index": index, "headers": headers, "moves": analysis}
+
+
+def load_checkpoint(path: str) -> Set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {int(line) for line in f if line.strip()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a PGN archive with the project's engine")
+    parser.add_argument("pgn", help="PGN file, e.g. one downloaded from /games/export.pgn")
+    parser.add_argument("--output", default="analysis.jsonl", help="one JSON line per analyzed game")
+    parser.add_argument("--checkpoint", help="indexes of finished games, defaults to OUTPUT.checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--movetime", type=float, default=0.2, help="engine time per position in seconds")
+    parser.add_argument("--max-nodes", type=int, default=200000)
+    parser.add_argument("--blunder-threshold", type=int, default=200, help="centipawns lost to count as a blunder")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"resuming, {len(done)} games already analyzed")
+
+    # Games are read lazily and only a few are in flight, so the archive never has to fit in memory
+    max_in_flight = 2 * args.workers
+    analyzed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, \
+            open(args.output, "a") as output, open(checkpoint_path, "a") as checkpoint:
+        pending = set()
+
+        def collect(futures):
+            nonlocal analyzed
+            for future in futures:
+                result = future.result()
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                # Only mark the game done once its result is safely written
+                checkpoint.write(f"{result['index']}\n")
+                checkpoint.flush()
+                analyzed += 1
+                blunders = sum(move["blunder"] for move in result["moves"])
+                print(f"game {result['index']}: {len(result['moves'])} moves, {blunders} blunders")
+
+        for index, game in read_games(args.pgn):
+            if index in done:
+                continue
+            if game.errors:
+                print(f"game {index}: skipped, {game.errors[0]}")
+                continue
+            moves = [move.uci() for move in game.mainline_moves()]
+            pending.add(pool.submit(
+                analyze_game, index, dict(game.headers), game.board().fen(), moves,
+                args.movetime, args.max_nodes, args.blunder_threshold,
+            ))
+            if len(pending) >= max_in_flight:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+
+    print(f"analyzed {analyzed} games, results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
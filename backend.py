@@ -0,0 +1,195 @@
+from typing import Dict, Iterator, Optional, Tuple
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import chess
+from store import GameStore, is_game_id, pack_moves, unpack_moves
+
+GameRecord = Tuple[chess.Board, int]
+
+
+class GameBackend:
+    # Boards handed out by load() are private copies. Writes go through save(),
+    # which only succeeds if nobody else has written since that load.
+
+    def create(self, board: chess.Board) -> str:
+        raise NotImplementedError
+
+    def load(self, game_id: str) -> Optional[GameRecord]:
+        raise NotImplementedError
+
+    def save(self, game_id: str, board: chess.Board, expected_version: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def reset(self, game_id: str, board: chess.Board) -> Optional[int]:
+        # Creates the game if it does not exist; None for ids create() could never have issued
+        raise NotImplementedError
+
+    def open(self):
+        # Called when the server starts, before any request
+        pass
+
+    def close(self):
+        pass
+
+    def finish(self, game_id: str):
+        pass
+
+    def iter_games(self) -> Iterator[Tuple[str, chess.Board]]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryBackend(GameBackend):
+    def __init__(self, store: GameStore):
+        self.store = store
+        self.conflicts = 0
+
+    def create(self, board: chess.Board) -> str:
+        game_id = str(uuid.uuid4())
+        self.store.put(game_id, board)
+        return game_id
+
+    def load(self, game_id: str) -> Optional[GameRecord]:
+        record = self.store.get(game_id)
+        if record is None:
+            return None
+        return record[0].copy(), record[1]
+
+    def save(self, game_id: str, board: chess.Board, expected_version: int) -> Optional[int]:
+        version = self.store.replace(game_id, board.copy(), expected_version)
+        if version is None:
+            self.conflicts += 1
+        return version
+
+    def reset(self, game_id: str, board: chess.Board) -> Optional[int]:
+        if not is_game_id(game_id):
+            return None
+        # Keep counting up from the old game so clients never see a version twice
+        while True:
+            record = self.store.get(game_id)
+            if record is None:
+                self.store.put(game_id, board)
+                return 0
+            version = self.store.replace(game_id, board, record[1])
+            if version is not None:
+                return version
+
+    def open(self):
+        # Fail at startup rather than on the first request if another process owns the directory
+        with self.store.lock:
+            self.store.claim()
+
+    def close(self):
+        self.store.release()
+
+    def finish(self, game_id: str):
+        # Finished games are only kept on disk until someone looks at them again
+        self.store.spill(game_id)
+
+    def iter_games(self) -> Iterator[Tuple[str, chess.Board]]:
+        return self.store.iter_games()
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.store.stats()
+        stats["conflicts"] = self.conflicts
+        return stats
+
+
+class SQLiteBackend(GameBackend):
+    # One WAL-mode database shared by every uvicorn worker; each thread gets its own connection
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.loads = 0
+        self.saves = 0
+        self.conflicts = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS games ("
+                " game_id TEXT PRIMARY KEY,"
+                " start_fen TEXT NOT NULL,"
+                " moves BLOB NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " updated REAL NOT NULL)"
+            )
+
+    def connection(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def create(self, board: chess.Board) -> str:
+        game_id = str(uuid.uuid4())
+        with self.connection() as db:
+            db.execute(
+                "INSERT INTO games (game_id, start_fen, moves, version, updated) VALUES (?, ?, ?, 0, ?)",
+                (game_id, board.root().fen(), pack_moves(board), time.time()),
+            )
+        return game_id
+
+    def load(self, game_id: str) -> Optional[GameRecord]:
+        row = self.connection().execute(
+            "SELECT start_fen, moves, version FROM games WHERE game_id = ?", (game_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.loads += 1
+        return unpack_moves(row[0], row[1]), row[2]
+
+    def save(self, game_id: str, board: chess.Board, expected_version: int) -> Optional[int]:
+        with self.connection() as db:
+            cursor = db.execute(
+                "UPDATE games SET start_fen = ?, moves = ?, version = version + 1, updated = ?"
+                " WHERE game_id = ? AND version = ?",
+                (board.root().fen(), pack_moves(board), time.time(), game_id, expected_version),
+            )
+        if cursor.rowcount != 1:
+            self.conflicts += 1
+            return None
+        self.saves += 1
+        return expected_version + 1
+
+    def reset(self, game_id: str, board: chess.Board) -> Optional[int]:
+        if not is_game_id(game_id):
+            return None
+        with self.connection() as db:
+            row = db.execute(
+                "INSERT INTO games (game_id, start_fen, moves, version, updated) VALUES (?, ?, ?, 0, ?)"
+                " ON CONFLICT (game_id) DO UPDATE SET start_fen = excluded.start_fen, moves = excluded.moves,"
+                " version = games.version + 1, updated = excluded.updated"
+                " RETURNING version",
+                (game_id, board.root().fen(), pack_moves(board), time.time()),
+            ).fetchone()
+        return row[0]
+
+    def iter_games(self) -> Iterator[Tuple[str, chess.Board]]:
+        # A dedicated connection, so the open cursor does not hold up this thread's other queries.
+        # Streaming responses may resume the generator on a different threadpool thread.
+        db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        try:
+            for game_id, start_fen, moves in db.execute("SELECT game_id, start_fen, moves FROM games"):
+                yield game_id, unpack_moves(start_fen, moves)
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, int]:
+        size = self.connection().execute("SELECT COUNT(*) FROM games").fetchone()[0]
+        return {
+            "size": size,
+            "loads": self.loads,
+            "saves": self.saves,
+            "conflicts": self.conflicts,
+        }
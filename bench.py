@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+import chess
+import httpx
+
+# White to move, e7 pawn promotes on e8
+PROMOTION_FEN = "k7/4P3/8/8/8/8/8/4K3 w - - 0 1"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_scenario(name: str, jobs: List[Callable[[], Awaitable[httpx.Response]]], concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(jobs)
+
+    async def worker():
+        nonlocal errors
+        for job in pending:
+            start = time.perf_counter()
+            try:
+                response = await job()
+                if response.status_code >= 400 or "error" in response.json():
+                    errors += 1
+            except (httpx.HTTPError, ValueError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run_suite(client: httpx.AsyncClient, args, seed_game: Optional[Callable[[str], str]]) -> List[Dict]:
+    results = []
+
+    game_ids: List[str] = []
+
+    async def start():
+        response = await client.post("/start")
+        game_ids.append(response.json()["game_id"])
+        return response
+
+    results.append(await run_scenario("start", [start] * args.games, args.concurrency))
+
+    def board_job(game_id):
+        return lambda: client.get(f"/board/{game_id}")
+
+    jobs = [board_job(game_id) for game_id in game_ids for _ in range(args.board_reads)]
+    results.append(await run_scenario("board", jobs, args.concurrency))
+
+    def move_job(game_id, from_square, to_square, promotion=None):
+        body = {"game_id": game_id, "from_square": from_square, "to_square": to_square, "promotion": promotion}
+        return lambda: client.post("/move", json=body)
+
+    jobs = [move_job(game_id, "e2", "e4") for game_id in game_ids]
+    results.append(await run_scenario("move", jobs, args.concurrency))
+
+    if seed_game is None:
+        results.append({"scenario": "promotion", "skipped": "cannot seed positions on an external server"})
+    else:
+        promotion_ids = [seed_game(PROMOTION_FEN) for _ in range(args.games)]
+        jobs = [move_job(game_id, "e7", "e8", "q") for game_id in promotion_ids]
+        results.append(await run_scenario("promotion", jobs, args.concurrency))
+
+    def restart_job(game_id):
+        return lambda: client.post(f"/restart/{game_id}")
+
+    results.append(await run_scenario("restart", [restart_job(game_id) for game_id in game_ids], args.concurrency))
+    return results
+
+
+def peak_rss_kb(children: bool = False) -> Optional[int]:
+    try:
+        import resource
+    except ImportError:
+        # No resource module on Windows; psutil can still report our own peak working set
+        if children:
+            return None
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) // 1024
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def process_peak_rss_kb(pid: int) -> Optional[int]:
+    # Peak RSS of a server process and the engine workers it forked, from /proc (Linux only)
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            if current == pid:
+                return None
+    return total
+
+
+async def bench_asgi(args) -> Dict:
+    # main mounts static/ relative to the working directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    # Keep games that get spilled or finished out of the real saved_games/
+    with tempfile.TemporaryDirectory(prefix="chess-bench-") as directory:
+        os.environ["CHESS_SAVE_DIR"] = directory
+        import main
+
+        def seed_game(fen):
+            return main.games.create(chess.Board(fen))
+
+        transport = httpx.ASGITransport(app=main.app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                results = await run_suite(client, args, seed_game)
+        finally:
+            if main.engine_pool is not None:
+                main.engine_pool.shutdown()
+                main.engine_pool = None
+            # Release the game store's lock file, Windows cannot remove the directory while it is open
+            main.games.close()
+    # Engine workers only show up in RUSAGE_CHILDREN once they have exited, and only the largest one counts
+    return {
+        "scenarios": results,
+        "peak_rss_kb": peak_rss_kb(),
+        "engine_worker_peak_rss_kb": peak_rss_kb(children=True),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_server(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                await client.get(url + "/")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("uvicorn did not start in time")
+
+
+async def bench_server(args) -> Dict:
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return {"scenarios": await run_suite(client, args, None), "peak_rss_kb": None}
+
+    # Our own server gets a scratch sqlite database, so we can seed promotion positions into it
+    from backend import SQLiteBackend
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "games.db")
+        port = free_port()
+        env = dict(
+            os.environ,
+            CHESS_BACKEND="sqlite",
+            CHESS_DB_PATH=db_path,
+            CHESS_SAVE_DIR=directory,
+            CHESS_ENGINE_MOVETIME=str(args.movetime),
+            CHESS_WORKERS=str(args.workers),
+        )
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            await wait_for_server(url, process)
+            seed_backend = SQLiteBackend(db_path)
+
+            def seed_game(fen):
+                return seed_backend.create(chess.Board(fen))
+
+            async with httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+                results = await run_suite(client, args, seed_game)
+            return {"scenarios": results, "peak_rss_kb": process_peak_rss_kb(process.pid)}
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the chess API in-process and against uvicorn")
+    parser.add_argument("--mode", choices=["asgi", "server", "both"], default="both")
+    parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--board-reads", type=int, default=5, help="/board requests per game")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    parser.add_argument("--movetime", type=float, default=0.05, help="engine time per AI reply in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    # main reads its configuration at import time
+    os.environ["CHESS_ENGINE_MOVETIME"] = str(args.movetime)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "results": {},
+    }
+    if args.mode in ("asgi", "both"):
+        report["results"]["asgi"] = asyncio.run(bench_asgi(args))
+    if args.mode in ("server", "both"):
+        report["results"]["server"] = asyncio.run(bench_server(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for mode, result in report["results"].items():
+        print(f"{mode} (peak RSS {result['peak_rss_kb']} kB)")
+        for scenario in result["scenarios"]:
+            if "skipped" in scenario:
+                print(f"  {scenario['scenario']:<10} skipped: {scenario['skipped']}")
+                continue
+            print(
+                f"  {scenario['scenario']:<10} {scenario['requests']:>6} req  {scenario['throughput']:>9.1f} req/s"
+                f"  p50 {scenario['p50_ms']:.1f} ms  p95 {scenario['p95_ms']:.1f} ms  p99 {scenario['p99_ms']:.1f} ms"
+                f"  errors {scenario['errors']}"
+            )
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
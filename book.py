@@ -0,0 +1,76 @@
+from typing import Dict, Optional, Tuple
+import chess
+import chess.polyglot
+import chess.syzygy
+
+
+class MoveLookup:
+    # Answers known positions from a Polyglot book and Syzygy tablebases before we spend time searching.
+    # The book is memory-mapped and probed by binary search, tablebase files are mapped as they are first needed.
+
+    def __init__(self, book_path: Optional[str] = None, syzygy_dir: Optional[str] = None, syzygy_max_pieces: int = 7):
+        self.book = chess.polyglot.open_reader(book_path) if book_path else None
+        self.tablebase = chess.syzygy.open_tablebase(syzygy_dir) if syzygy_dir else None
+        self.syzygy_max_pieces = syzygy_max_pieces
+        self.book_hits = 0
+        self.book_misses = 0
+        self.tablebase_hits = 0
+        self.tablebase_misses = 0
+
+    def probe(self, board: chess.Board) -> Optional[Tuple[chess.Move, str]]:
+        if self.book is not None:
+            try:
+                move = self.book.weighted_choice(board).move
+            except IndexError:
+                self.book_misses += 1
+            else:
+                self.book_hits += 1
+                return move, "book"
+
+        if self.tablebase is not None and chess.popcount(board.occupied) <= self.syzygy_max_pieces:
+            move = self.probe_tablebase(board)
+            if move is None:
+                self.tablebase_misses += 1
+            else:
+                self.tablebase_hits += 1
+                return move, "tablebase"
+        return None
+
+    def probe_tablebase(self, board: chess.Board) -> Optional[chess.Move]:
+        best_move = None
+        best_key = None
+        for move in board.legal_moves:
+            board.push(move)
+            try:
+                wdl = -self.tablebase.probe_wdl(board)
+                dtz = -self.tablebase.probe_dtz(board)
+            except KeyError:
+                return None
+            finally:
+                board.pop()
+            # Win as fast as possible, lose as slowly as possible
+            key = (wdl, -abs(dtz) if wdl > 0 else abs(dtz))
+            if best_key is None or key > best_key:
+                best_move = move
+                best_key = key
+        return best_move
+
+    def close(self):
+        if self.book is not None:
+            self.book.close()
+        if self.tablebase is not None:
+            self.tablebase.close()
+
+    def stats(self) -> Dict[str, float]:
+        book_lookups = self.book_hits + self.book_misses
+        tablebase_lookups = self.tablebase_hits + self.tablebase_misses
+        return {
+            "book_enabled": self.book is not None,
+            "book_hits": self.book_hits,
+            "book_misses": self.book_misses,
+            "book_hit_rate": round(self.book_hits / book_lookups, 4) if book_lookups else 0.0,
+            "tablebase_enabled": self.tablebase is not None,
+            "tablebase_hits": self.tablebase_hits,
+            "tablebase_misses": self.tablebase_misses,
+            "tablebase_hit_rate": round(self.tablebase_hits / tablebase_lookups, 4) if tablebase_lookups else 0.0,
+        }
@@ -0,0 +1,297 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import time
+import chess
+import chess.polyglot
+from status import position_status
+from store import pack_move, unpack_move
+
+MATE_SCORE = 100000
+MAX_PLY = 1000
+INFINITY = 10 ** 9
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+# Piece-square tables from white's point of view, a8..h8 first so they read like a board
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    chess.KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+TT_EXACT = 0
+TT_LOWER = 1
+TT_UPPER = 2
+TT_MAX_ENTRIES = int(os.environ.get("CHESS_ENGINE_TT_SIZE", "200000"))
+# Packed 0 is a1a1, which is never legal, so it stands for "no best move"
+TT_NO_MOVE = 0
+
+# Survives between searches in the same worker process, so consecutive
+# moves of a game start with a warm table. Moves are stored packed to 16 bits;
+# a chess.Move object per entry would more than double the table's footprint.
+transposition_table: Dict[int, Tuple[int, int, int, int]] = {}
+
+
+@dataclass
+class SearchResult:
+    move: Optional[str]
+    score: int
+    depth: int
+    nodes: int
+    elapsed: float
+
+    @property
+    def nps(self) -> int:
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else self.nodes
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Mate scores count plies from the root; the table stores them relative to the node so they stay valid at any ply
+def score_to_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def evaluate(board: chess.Board) -> int:
+    score = 0
+    for square, piece in board.piece_map().items():
+        # Tables are laid out rank 8 first, so white squares need flipping
+        index = chess.square_mirror(square) if piece.color == chess.WHITE else square
+        value = PIECE_VALUES[piece.piece_type] + PIECE_SQUARE_TABLES[piece.piece_type][index]
+        score += value if piece.color == chess.WHITE else -value
+    return score if board.turn == chess.WHITE else -score
+
+
+class Searcher:
+    def __init__(self, board: chess.Board, movetime: float, max_nodes: int):
+        self.board = board
+        self.deadline = time.monotonic() + movetime
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.killers: Dict[int, List[chess.Move]] = {}
+
+    def check_budget(self):
+        if self.nodes >= self.max_nodes:
+            raise SearchTimeout()
+        if self.nodes & 1023 == 0 and time.monotonic() >= self.deadline:
+            raise SearchTimeout()
+
+    def order_moves(self, moves, tt_move: Optional[chess.Move], ply: int) -> List[chess.Move]:
+        board = self.board
+        killers = self.killers.get(ply, [])
+
+        def key(move: chess.Move) -> int:
+            if move == tt_move:
+                return -INFINITY
+            score = 0
+            if board.is_capture(move):
+                victim = board.piece_type_at(move.to_square) or chess.PAWN
+                attacker = board.piece_type_at(move.from_square)
+                score -= 10 * PIECE_VALUES[victim] - PIECE_VALUES[attacker] + 10000
+            elif move in killers:
+                score -= 5000
+            if move.promotion:
+                score -= PIECE_VALUES[move.promotion]
+            return score
+
+        return sorted(moves, key=key)
+
+    def quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        self.check_budget()
+        board = self.board
+
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return beta
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self.order_moves(board.generate_legal_captures(), None, ply):
+            board.push(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return beta
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        self.check_budget()
+        board = self.board
+
+        if ply > 0 and (board.is_repetition(2) or board.is_fifty_moves()):
+            return 0
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = transposition_table.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, flag, entry_score, packed_move = entry
+            if packed_move != TT_NO_MOVE:
+                tt_move = unpack_move(packed_move)
+            entry_score = score_from_tt(entry_score, ply)
+            if ply > 0 and entry_depth >= depth:
+                if flag == TT_EXACT:
+                    return entry_score
+                if flag == TT_LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == TT_UPPER and entry_score <= alpha:
+                    return entry_score
+
+        if depth <= 0:
+            return self.quiesce(alpha, beta, ply)
+
+        moves = list(board.legal_moves)
+        if not moves:
+            return -MATE_SCORE + ply if board.is_check() else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in self.order_moves(moves, tt_move, ply):
+            board.push(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move):
+                    killers = self.killers.setdefault(ply, [])
+                    if move not in killers:
+                        killers.insert(0, move)
+                        del killers[2:]
+                break
+
+        if best_score <= original_alpha:
+            flag = TT_UPPER
+        elif best_score >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        if len(transposition_table) >= TT_MAX_ENTRIES:
+            transposition_table.clear()
+        packed_move = pack_move(best_move) if best_move is not None else TT_NO_MOVE
+        transposition_table[key] = (depth, flag, score_to_tt(best_score, ply), packed_move)
+        return best_score
+
+
+def search(fen: str, moves: Sequence[str] = (), movetime: float = 1.0, max_nodes: int = 200000,
+           max_depth: int = 64) -> SearchResult:
+    # fen is the game's starting position and moves its history, so repetitions are seen by the search
+    board = chess.Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    history = len(board.move_stack)
+    searcher = Searcher(board, movetime, max_nodes)
+    start = time.monotonic()
+
+    status = position_status(board)
+    legal_moves = status.moves()
+    if not legal_moves:
+        return SearchResult(None, -MATE_SCORE if status.is_checkmate else 0, 0, 0, 0.0)
+
+    best_move = legal_moves[0]
+    best_score = 0
+    depth_reached = 0
+    for depth in range(1, max_depth + 1):
+        try:
+            score = searcher.negamax(depth, -INFINITY, INFINITY, 0)
+        except SearchTimeout:
+            # Unwind whatever the interrupted iteration left on the stack
+            while len(board.move_stack) > history:
+                board.pop()
+            break
+        entry = transposition_table.get(chess.polyglot.zobrist_hash(board))
+        if entry is not None and entry[3] != TT_NO_MOVE:
+            best_move = unpack_move(entry[3])
+        best_score = score
+        depth_reached = depth
+        if abs(score) >= MATE_SCORE - max_depth or len(legal_moves) == 1:
+            break
+
+    return SearchResult(best_move.uci(), best_score, depth_reached, searcher.nodes, time.monotonic() - start)
@@ -1,17 +1,100 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import Optional, Dict
-import random
+from pydantic import BaseModel, Field, ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Optional, Dict, Iterator, List, Tuple
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import tempfile
+import os
 import uvicorn
-import uuid
 import chess
+import chess.pgn
+import engine
+from backend import GameBackend, GameRecord, MemoryBackend, SQLiteBackend
+from book import MoveLookup
+from status import position_status, status_cache
+from store import GameStore
 
-app = FastAPI()
+ENGINE_MOVETIME = float(os.environ.get("CHESS_ENGINE_MOVETIME", "1.0"))
+ENGINE_MAX_NODES = int(os.environ.get("CHESS_ENGINE_MAX_NODES", "200000"))
+SAVE_DIR = os.environ.get("CHESS_SAVE_DIR", "saved_games")
+STORE_CAPACITY = int(os.environ.get("CHESS_STORE_CAPACITY", "1000"))
+STORE_TTL = float(os.environ.get("CHESS_STORE_TTL", "1800"))
+# "memory" keeps games in this process; "sqlite" shares them between uvicorn workers
+STORAGE_BACKEND = os.environ.get("CHESS_BACKEND", "memory")
+DB_PATH = os.environ.get("CHESS_DB_PATH", os.path.join(SAVE_DIR, "games.db"))
+# uvicorn takes its default worker count from WEB_CONCURRENCY
+WORKERS = int(os.environ.get("CHESS_WORKERS", os.environ.get("WEB_CONCURRENCY", "1")))
+# Every uvicorn worker has its own engine pool, so they split the cores between them
+ENGINE_WORKERS = int(os.environ.get("CHESS_ENGINE_WORKERS", str(max(1, (os.cpu_count() or 1) // WORKERS))))
+MAX_MOVE_ATTEMPTS = 3
+LONG_POLL_TIMEOUT = 30.0
+LONG_POLL_MAX_TIMEOUT = 60.0
+# Other workers cannot wake our waiters, so long polls also recheck the backend this often
+LONG_POLL_RECHECK = 1.0
+INDEX_PATH = "static/index.html"
+BOOK_PATH = os.environ.get("CHESS_BOOK_PATH")
+SYZYGY_DIR = os.environ.get("CHESS_SYZYGY_DIR")
+SYZYGY_MAX_PIECES = int(os.environ.get("CHESS_SYZYGY_MAX_PIECES", "7"))
+MAX_BATCH_SIZE = int(os.environ.get("CHESS_MAX_BATCH_SIZE", "10000"))
+# How many games of one batch play their moves at the same time
+BATCH_CONCURRENCY = int(os.environ.get("CHESS_BATCH_CONCURRENCY", str(2 * ENGINE_WORKERS)))
+BATCH_CHUNK_SIZE = 100
+# PGN uploads larger than this are spooled to a temporary file instead of memory
+IMPORT_SPOOL_SIZE = 1024 * 1024
+
+engine_pool: Optional[ProcessPoolExecutor] = None
+
+def get_engine_pool() -> ProcessPoolExecutor:
+    # Created lazily so that importing main (or driving the app without lifespan
+    # events) does not start worker processes. Workers are spawned rather than forked:
+    # a fork of this threaded server could inherit a lock (the status cache's, say) held
+    # by another thread and hang on it forever.
+    global engine_pool
+    if engine_pool is None:
+        engine_pool = ProcessPoolExecutor(max_workers=ENGINE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return engine_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    games.open()
+    yield
+    global engine_pool
+    if engine_pool is not None:
+        engine_pool.shutdown(cancel_futures=True)
+        engine_pool = None
+    move_lookup.close()
+    games.close()
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-games: Dict[str, chess.Board] = {}
+def make_backend() -> GameBackend:
+    if WORKERS > 1 and STORAGE_BACKEND != "sqlite":
+        raise RuntimeError("CHESS_WORKERS > 1 needs CHESS_BACKEND=sqlite, in-memory games are not shared between workers")
+    # `uvicorn --workers N` without CHESS_WORKERS is caught by the game store's lock on SAVE_DIR
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteBackend(DB_PATH)
+    return MemoryBackend(GameStore(SAVE_DIR, capacity=STORE_CAPACITY, ttl=STORE_TTL))
+
+games = make_backend()
+move_lookup = MoveLookup(BOOK_PATH, SYZYGY_DIR, SYZYGY_MAX_PIECES)
+
+# Sockets watching each game in this process, with the last version each one was sent
+channels: Dict[str, Dict[WebSocket, int]] = {}
+# Set and replaced whenever a game's version changes, wakes long-polling /board requests
+version_events: Dict[str, asyncio.Event] = {}
+# Long polls currently waiting on each game; the event is dropped when the last one leaves
+version_waiters: Dict[str, int] = {}
+# (mtime, body, etag) of the last index.html read from disk
+index_page: Optional[Tuple[int, str, str]] = None
 
 class MoveRequest(BaseModel):
     game_id: str
@@ -19,72 +102,458 @@ class MoveRequest(BaseModel):
     to_square: str
     promotion: Optional[str] = None
 
+class BatchStartRequest(BaseModel):
+    count: int = Field(ge=1, le=MAX_BATCH_SIZE)
+
+class BatchMoveRequest(BaseModel):
+    # Items are validated one by one, so a malformed move only fails its own result
+    moves: List[Any] = Field(max_length=MAX_BATCH_SIZE)
+
+class BatchBoardRequest(BaseModel):
+    game_ids: List[str] = Field(max_length=MAX_BATCH_SIZE)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+def load_index() -> Tuple[str, str]:
+    global index_page
+    mtime = os.stat(INDEX_PATH).st_mtime_ns
+    if index_page is None or index_page[0] != mtime:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        index_page = (mtime, body, etag)
+    return index_page[1], index_page[2]
+
 @app.get("/", response_class=HTMLResponse)
-def get_index():
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+def get_index(request: Request):
+    body, etag = load_index()
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(body, headers={"ETag": etag, "Cache-Control": "no-cache"})
 
 @app.post("/start")
 def start_game():
-    game_id = str(uuid.uuid4())
-    games[game_id] = chess.Board()
+    game_id = games.create(chess.Board())
     return {"game_id": game_id}
 
+async def wait_for_game(game_id: str, version: int, timeout: float) -> Optional[GameRecord]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0.0, min(timeout, LONG_POLL_MAX_TIMEOUT))
+    record = await run_in_threadpool(games.load, game_id)
+    if not record or record[1] >= version or deadline <= loop.time():
+        return record
+
+    version_waiters[game_id] = version_waiters.get(game_id, 0) + 1
+    try:
+        while True:
+            # Take the event before loading, so a change made in between still wakes us
+            event = version_events.setdefault(game_id, asyncio.Event())
+            record = await run_in_threadpool(games.load, game_id)
+            remaining = deadline - loop.time()
+            if not record or record[1] >= version or remaining <= 0:
+                return record
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, LONG_POLL_RECHECK))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        version_waiters[game_id] -= 1
+        if not version_waiters[game_id]:
+            del version_waiters[game_id]
+            version_events.pop(game_id, None)
+
 @app.get("/board/{game_id}")
-def get_board(game_id: str):
-    board = games.get(game_id)
-    if not board:
+async def get_board(game_id: str, request: Request, wait_for_version: Optional[int] = None, timeout: float = LONG_POLL_TIMEOUT):
+    if wait_for_version is None:
+        record = await run_in_threadpool(games.load, game_id)
+    else:
+        record = await wait_for_game(game_id, wait_for_version, timeout)
+    if not record:
         return {"error": "Game not found"}
+
+    board, version = record
+    etag = f'"{version}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(board_state(board, version), headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def load_state(game_id: str) -> dict:
+    record = games.load(game_id)
+    if not record:
+        return {"error": "Game not found"}
+    return board_state(*record)
+
+def human_to_move(board: chess.Board) -> bool:
+    # The human plays the side to move at the start of the game and the AI always answers,
+    # so it is the human's turn exactly when an even number of moves has been played
+    return len(board.move_stack) % 2 == 0
+
+def board_state(board: chess.Board, version: int):
+    status = position_status(board)
     return {
-        "fen": board.fen(),
+        "version": version,
+        "fen": status.fen(board),
         "turn": "white" if board.turn == chess.WHITE else "black",
-        "is_check": board.is_check(),
-        "is_checkmate": board.is_checkmate(),
-        "is_stalemate": board.is_stalemate(),
-        "winner": "black" if board.is_checkmate() and board.turn == chess.WHITE else "white" if board.is_checkmate() else None,
-        "is_game_over": board.is_game_over(),
+        "your_turn": human_to_move(board),
+        "is_check": status.is_check,
+        "is_checkmate": status.is_checkmate,
+        "is_stalemate": status.is_stalemate,
+        "winner": "black" if status.is_checkmate and board.turn == chess.WHITE else "white" if status.is_checkmate else None,
+        "is_game_over": status.is_game_over(board),
         "promotion_rank": 6 if board.turn == chess.WHITE else 1
     }
 
-@app.post("/move")
-def play_move(move: MoveRequest):
-    board = games.get(move.game_id)
-    if not board or board.is_game_over():
-        return get_board(move.game_id)
-
-    move_uci = move.from_square + move.to_square
-    from_sq = chess.parse_square(move.from_square)
-    to_sq = chess.parse_square(move.to_square)
-    piece = board.piece_at(from_sq)
-
-    # Handle promotion properly
-    if piece and piece.piece_type == chess.PAWN and (chess.square_rank(to_sq) == 0 or chess.square_rank(to_sq) == 7):
-        if move.promotion:
-            move_uci += move.promotion.lower()
+def socket_message(board: chess.Board, version: int) -> dict:
+    # The legal move map lets the client detect promotions without asking the server.
+    # It stays empty while the AI is to move.
+    legal_moves: Dict[str, list] = {}
+    promotions = set()
+    for legal_move in position_status(board).moves() if human_to_move(board) else ():
+        from_name = chess.square_name(legal_move.from_square)
+        to_name = chess.square_name(legal_move.to_square)
+        if legal_move.promotion:
+            if from_name + to_name in promotions:
+                continue
+            promotions.add(from_name + to_name)
+        legal_moves.setdefault(from_name, []).append(to_name)
+    message = board_state(board, version)
+    message["type"] = "state"
+    message["legal_moves"] = legal_moves
+    message["promotions"] = sorted(promotions)
+    return message
+
+async def game_changed(game_id: str, board: chess.Board, version: int, ai: Optional[dict] = None):
+    # Wake long-polling /board requests and push the new state to open sockets
+    event = version_events.pop(game_id, None)
+    if event is not None:
+        event.set()
+    sockets = channels.get(game_id)
+    if not sockets:
+        return
+    message = socket_message(board, version)
+    message["ai"] = ai
+    for websocket in list(sockets):
+        if websocket not in sockets:
+            continue
+        # Recorded before sending, so watch_game does not push the same version again
+        sockets[websocket] = max(sockets[websocket], version)
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            sockets.pop(websocket, None)
+
+async def watch_game(websocket: WebSocket, game_id: str):
+    # game_changed only reaches sockets in this process. Changes made through other workers
+    # are picked up the way long polls see them, by rechecking the backend.
+    sockets = channels[game_id]
+    while websocket in sockets:
+        record = await wait_for_game(game_id, sockets[websocket] + 1, LONG_POLL_MAX_TIMEOUT)
+        if record is None:
+            return
+        if websocket in sockets and record[1] > sockets[websocket]:
+            sockets[websocket] = record[1]
+            try:
+                await websocket.send_json(socket_message(*record))
+            except Exception:
+                return
+
+def commit_human_move(move: MoveRequest) -> Tuple[dict, Optional[chess.Board], Optional[int]]:
+    # Returns the response, plus the board and its new version if the move was stored
+    for _ in range(MAX_MOVE_ATTEMPTS):
+        record = games.load(move.game_id)
+        if not record:
+            return {"error": "Game not found"}, None, None
+        board, version = record
+        status = position_status(board)
+        if status.is_game_over(board):
+            return board_state(board, version), None, None
+        if not human_to_move(board):
+            # The AI is still thinking about its reply
+            return {"error": "Not your turn"}, None, None
+
+        move_uci = move.from_square + move.to_square
+        try:
+            from_sq = chess.parse_square(move.from_square)
+            to_sq = chess.parse_square(move.to_square)
+        except ValueError:
+            return board_state(board, version), None, None
+        piece = board.piece_at(from_sq)
+
+        # Handle promotion properly
+        if piece and piece.piece_type == chess.PAWN and (chess.square_rank(to_sq) == 0 or chess.square_rank(to_sq) == 7):
+            if move.promotion:
+                move_uci += move.promotion.lower()
+            else:
+                return {"error": "Promotion required"}, None, None
+
+        try:
+            uci_move = chess.Move.from_uci(move_uci)
+        except ValueError:
+            return board_state(board, version), None, None
+        if not status.is_legal(uci_move):
+            return board_state(board, version), None, None
+        board.push(uci_move)
+
+        # Fails if somebody else moved in this game since we loaded it; retry on the new position
+        new_version = games.save(move.game_id, board, version)
+        if new_version is not None:
+            return board_state(board, new_version), board, new_version
+    return {"error": "Game is being modified concurrently"}, None, None
+
+async def play_ai_reply(game_id: str, board: chess.Board, version: int) -> Optional[dict]:
+    # Pushes the AI move onto board and stores it; returns None if the game changed meanwhile
+    known = await run_in_threadpool(move_lookup.probe, board)
+    if known:
+        ai = {"move": known[0].uci(), "source": known[1], "depth": 0, "nodes": 0, "nps": 0, "time": 0.0}
+    else:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            get_engine_pool(), engine.search, board.root().fen(), [move.uci() for move in board.move_stack],
+            ENGINE_MOVETIME, ENGINE_MAX_NODES,
+        )
+        if not result.move:
+            return None
+        ai = {
+            "move": result.move,
+            "source": "search",
+            "depth": result.depth,
+            "nodes": result.nodes,
+            "nps": result.nps,
+            "time": round(result.elapsed, 3),
+        }
+    board.push(chess.Move.from_uci(ai["move"]))
+    if await run_in_threadpool(games.save, game_id, board, version) is None:
+        board.pop()
+        return None
+    return ai
+
+async def play_turn(move: MoveRequest) -> Tuple[dict, bool]:
+    # The whole turn, shared by /move, /batch/move and the socket: store the human move, notify
+    # watchers, play the AI reply and retire the game if it ended. Returns the state to answer
+    # with and whether the human move was stored.
+    state, board, version = await run_in_threadpool(commit_human_move, move)
+    if board is None:
+        return state, False
+    await game_changed(move.game_id, board, version)
+
+    # AI move, searched in the engine pool so the event loop keeps serving other games
+    ai = None
+    if not state["is_game_over"]:
+        ai = await play_ai_reply(move.game_id, board, version)
+        if ai:
+            state = board_state(board, version + 1)
+            await game_changed(move.game_id, board, version + 1, ai)
         else:
-            return {"error": "Promotion required"}
+            state = await run_in_threadpool(load_state, move.game_id)
 
-    try:
-        uci_move = chess.Move.from_uci(move_uci)
-        if uci_move in board.legal_moves:
-            board.push(uci_move)
-            # AI move
-            if not board.is_game_over():
-                legal_moves = list(board.legal_moves)
-                if legal_moves:
-                    board.push(random.choice(legal_moves))
-    except:
-        pass
+    state["ai"] = ai
+    if state.get("is_game_over"):
+        await run_in_threadpool(games.finish, move.game_id)
+    return state, True
 
-    return get_board(move.game_id)
+@app.post("/move")
+async def play_move(move: MoveRequest):
+    state, _ = await play_turn(move)
+    return state
 
 @app.post("/restart/{game_id}")
-def restart_game(game_id: str):
-    games[game_id] = chess.Board()
-    return get_board(game_id)
+async def restart_game(game_id: str):
+    board = chess.Board()
+    version = await run_in_threadpool(games.reset, game_id, board)
+    if version is None:
+        return {"error": "Game not found"}
+    await game_changed(game_id, board, version)
+    return board_state(board, version)
+
+def ndjson(item: dict) -> str:
+    return json.dumps(item) + "\n"
+
+def create_games(count: int) -> List[str]:
+    return [games.create(chess.Board()) for _ in range(count)]
+
+def load_states(game_ids: List[str]) -> List[dict]:
+    return [dict(load_state(game_id), game_id=game_id) for game_id in game_ids]
+
+@app.post("/batch/start")
+async def batch_start(request: BatchStartRequest):
+    async def results():
+        for offset in range(0, request.count, BATCH_CHUNK_SIZE):
+            game_ids = await run_in_threadpool(create_games, min(BATCH_CHUNK_SIZE, request.count - offset))
+            yield "".join(ndjson({"game_id": game_id}) for game_id in game_ids)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/batch/board")
+async def batch_board(request: BatchBoardRequest):
+    async def results():
+        for offset in range(0, len(request.game_ids), BATCH_CHUNK_SIZE):
+            states = await run_in_threadpool(load_states, request.game_ids[offset:offset + BATCH_CHUNK_SIZE])
+            yield "".join(ndjson(state) for state in states)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/batch/move")
+async def batch_move(request: BatchMoveRequest):
+    # Moves of one game are played in order, different games run concurrently.
+    # Results are streamed as they finish and carry the index of their move in the request.
+    by_game: Dict[Optional[str], List[Tuple[int, Any]]] = {}
+    for index, item in enumerate(request.moves):
+        game_id = item.get("game_id") if isinstance(item, dict) else None
+        by_game.setdefault(game_id if isinstance(game_id, str) else None, []).append((index, item))
+
+    async def results():
+        queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_CHUNK_SIZE)
+        limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def play_game(items: List[Tuple[int, Any]]):
+            async with limit:
+                for index, item in items:
+                    try:
+                        move = MoveRequest.model_validate(item)
+                    except ValidationError as e:
+                        errors = e.errors(include_url=False, include_context=False, include_input=False)
+                        await queue.put({"index": index, "error": "Invalid move", "details": errors})
+                        continue
+                    try:
+                        state = await play_move(move)
+                    except Exception as e:
+                        state = {"error": str(e)}
+                    await queue.put(dict(state, index=index, game_id=move.game_id))
+
+        tasks = [asyncio.create_task(play_game(items)) for items in by_game.values()]
+        try:
+            for _ in range(len(request.moves)):
+                yield ndjson(await queue.get())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def export_games(finished_only: bool) -> Iterator[str]:
+    for game_id, board in games.iter_games():
+        if finished_only and not position_status(board).is_game_over(board):
+            continue
+        game = chess.pgn.Game.from_board(board)
+        game.headers["Event"] = "chess-project game"
+        game.headers["GameId"] = game_id
+        yield str(game) + "\n\n"
+
+@app.get("/games/export.pgn")
+def export_pgn(finished_only: bool = False):
+    return StreamingResponse(export_games(finished_only), media_type="application/x-chess-pgn")
+
+def import_games(upload) -> Iterator[str]:
+    try:
+        pgn = io.TextIOWrapper(upload, encoding="utf-8", errors="replace")
+        index = 0
+        while True:
+            game = chess.pgn.read_game(pgn)
+            if game is None:
+                break
+            if game.errors:
+                yield ndjson({"index": index, "error": str(game.errors[0])})
+            else:
+                board = game.end().board()
+                yield ndjson({"index": index, "game_id": games.create(board), "moves": len(board.move_stack)})
+            index += 1
+    finally:
+        upload.close()
+
+@app.post("/games/import.pgn")
+async def import_pgn(request: Request):
+    # Games are parsed and stored one at a time while the results stream back
+    upload = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    upload.seek(0)
+    return StreamingResponse(import_games(upload), media_type="application/x-ndjson")
+
+@app.websocket("/ws/{game_id}")
+async def game_socket(websocket: WebSocket, game_id: str):
+    await websocket.accept()
+    record = await run_in_threadpool(games.load, game_id)
+    if not record:
+        await websocket.send_json({"type": "error", "error": "Game not found"})
+        await websocket.close()
+        return
+
+    channels.setdefault(game_id, {})[websocket] = record[1]
+    watcher = asyncio.create_task(watch_game(websocket, game_id))
+    try:
+        await websocket.send_json(socket_message(*record))
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Binary frames carry "bytes" instead of "text" and are as malformed as bad JSON
+            try:
+                data = json.loads(message["text"]) if message.get("text") is not None else None
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                await websocket.send_json({"type": "error", "error": "Messages must be JSON objects"})
+                continue
+            if data.get("type") == "restart":
+                board = chess.Board()
+                version = await run_in_threadpool(games.reset, game_id, board)
+                if version is None:
+                    await websocket.send_json({"type": "error", "error": "Game not found"})
+                else:
+                    await game_changed(game_id, board, version)
+                continue
+            if data.get("type") != "move":
+                await websocket.send_json({"type": "error", "error": "Unknown message type"})
+                continue
+
+            try:
+                move = MoveRequest(
+                    game_id=game_id,
+                    from_square=data.get("from_square"),
+                    to_square=data.get("to_square"),
+                    promotion=data.get("promotion"),
+                )
+            except ValidationError:
+                await websocket.send_json({"type": "error", "error": "Invalid move"})
+                continue
+
+            # Played moves reach this socket through game_changed: the human move right
+            # away, the AI reply once the search is done
+            state, played = await play_turn(move)
+            if played:
+                continue
+            if "error" in state:
+                await websocket.send_json({"type": "error", "error": state["error"]})
+            else:
+                # Rejected move, resend the current position so the client can resync
+                record = await run_in_threadpool(games.load, game_id)
+                if record:
+                    await websocket.send_json(socket_message(*record))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watcher.cancel()
+        sockets = channels.get(game_id)
+        if sockets is not None:
+            sockets.pop(websocket, None)
+            if not sockets:
+                del channels[game_id]
+
+@app.get("/stats")
+def get_stats():
+    lookups = move_lookup.stats()
+    # Every answered lookup is a search we did not have to run
+    lookups["saved_search_seconds"] = round((move_lookup.book_hits + move_lookup.tablebase_hits) * ENGINE_MOVETIME, 3)
+    return {"games": games.stats(), "position_cache": status_cache.stats(), "lookups": lookups}
 
-if _name_ == "_main_":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+if __name__ == "__main__":
+    # Several workers need the shared sqlite backend, and uvicorn cannot reload them
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=WORKERS == 1, workers=WORKERS)
 
 
 
@@ -0,0 +1,93 @@
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List
+import os
+import threading
+import chess
+import chess.polyglot
+from store import pack_move, unpack_move
+
+CACHE_SIZE = int(os.environ.get("CHESS_STATUS_CACHE_SIZE", "10000"))
+
+
+@dataclass(frozen=True)
+class PositionStatus:
+    # Everything here depends only on the position, not on how the game got there
+    epd: str
+    is_check: bool
+    is_checkmate: bool
+    is_stalemate: bool
+    is_insufficient_material: bool
+    # Packed 16-bit moves; a set of Move objects costs several kilobytes per entry
+    legal_moves: array
+
+    def moves(self) -> List[chess.Move]:
+        return [unpack_move(value) for value in self.legal_moves]
+
+    def is_legal(self, move: chess.Move) -> bool:
+        return pack_move(move) in self.legal_moves
+
+    def fen(self, board: chess.Board) -> str:
+        return f"{self.epd} {board.halfmove_clock} {board.fullmove_number}"
+
+    def is_game_over(self, board: chess.Board) -> bool:
+        # Same outcome as board.is_game_over(), the history-dependent rules still need the board
+        return (
+            self.is_checkmate
+            or self.is_stalemate
+            or self.is_insufficient_material
+            or board.is_seventyfive_moves()
+            or board.is_fivefold_repetition()
+        )
+
+
+class StatusCache:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: "OrderedDict[int, PositionStatus]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board: chess.Board) -> PositionStatus:
+        key = chess.polyglot.zobrist_hash(board)
+        with self.lock:
+            status = self.entries.get(key)
+            if status is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return status
+            self.misses += 1
+
+        legal_moves = array("H", map(pack_move, board.legal_moves))
+        is_check = board.is_check()
+        status = PositionStatus(
+            epd=board.epd(),
+            is_check=is_check,
+            is_checkmate=is_check and not legal_moves,
+            is_stalemate=not is_check and not legal_moves,
+            is_insufficient_material=board.is_insufficient_material(),
+            legal_moves=legal_moves,
+        )
+        with self.lock:
+            self.entries[key] = status
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return status
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+status_cache = StatusCache(CACHE_SIZE)
+
+def position_status(board: chess.Board) -> PositionStatus:
+    return status_cache.get(board)
@@ -0,0 +1,225 @@
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+import os
+import threading
+import time
+import uuid
+import chess
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# A move packs into 16 bits: from square (6), to square (6), promotion piece type (3)
+def pack_move(move: chess.Move) -> int:
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+def unpack_move(value: int) -> chess.Move:
+    return chess.Move(value & 0x3F, value >> 6 & 0x3F, (value >> 12) or None)
+
+def pack_moves(board: chess.Board) -> bytes:
+    return array("H", map(pack_move, board.move_stack)).tobytes()
+
+def unpack_moves(start_fen: str, data: bytes) -> chess.Board:
+    packed = array("H")
+    packed.frombytes(data)
+    board = chess.Board(start_fen)
+    for value in packed:
+        board.push(unpack_move(value))
+    return board
+
+def encode_game(board: chess.Board, version: int = 0) -> bytes:
+    return b"%d\n" % version + board.root().fen().encode("ascii") + b"\n" + pack_moves(board)
+
+def decode_game(data: bytes) -> Tuple[chess.Board, int]:
+    version, _, data = data.partition(b"\n")
+    start_fen, _, moves = data.partition(b"\n")
+    return unpack_moves(start_fen.decode("ascii"), moves), int(version)
+
+def is_game_id(game_id: str) -> bool:
+    # Only ids in the form create() hands out, which are also safe file names
+    try:
+        return str(uuid.UUID(game_id)) == game_id
+    except ValueError:
+        return False
+
+
+class GameStore:
+    def __init__(self, directory: str, capacity: int = 1000, ttl: float = 1800.0):
+        self.directory = directory
+        self.capacity = capacity
+        self.ttl = ttl
+        self.games: "OrderedDict[str, Tuple[chess.Board, int, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+        self.loads = 0
+        self.lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def path(self, game_id: str) -> Optional[str]:
+        # Game ids come straight from the URL, only accept ones we could have issued
+        if not is_game_id(game_id):
+            return None
+        return os.path.join(self.directory, game_id + ".game")
+
+    def claim(self):
+        # Rehydrated games are deleted from disk, so two processes sharing the directory would
+        # take each other's games. The first one to touch the store locks it until it exits.
+        # Called with self.lock held; lazily, so importing the app does not claim anything.
+        if self.lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.directory, "store.lock"), "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"{self.directory} is in use by another process; "
+                "run several workers with CHESS_BACKEND=sqlite"
+            ) from None
+        self.lock_file = lock_file
+
+    def release(self):
+        with self.lock:
+            if self.lock_file is not None:
+                self.lock_file.close()
+                self.lock_file = None
+
+    def get(self, game_id: str) -> Optional[Tuple[chess.Board, int]]:
+        with self.lock:
+            self.claim()
+            entry = self.games.get(game_id)
+            if entry is not None:
+                self.hits += 1
+                self.games[game_id] = (entry[0], entry[1], time.monotonic())
+                self.games.move_to_end(game_id)
+                return entry[0], entry[1]
+            self.misses += 1
+
+            # Rehydrate under the lock, so a concurrent spill or eviction cannot hand out an older copy.
+            # The file is removed once the game is back in memory; memory is then the only copy.
+            loaded = self.load(game_id)
+            if loaded is None:
+                return None
+            self.loads += 1
+            self.insert(game_id, *loaded)
+            self.discard(game_id)
+            return loaded
+
+    def put(self, game_id: str, board: chess.Board, version: int = 0):
+        with self.lock:
+            self.claim()
+            self.insert(game_id, board, version)
+
+    def replace(self, game_id: str, board: chess.Board, expected_version: int) -> Optional[int]:
+        # Compare-and-set on the version, rehydrating first if the game was spilled
+        if self.get(game_id) is None:
+            return None
+        with self.lock:
+            entry = self.games.get(game_id)
+            if entry is None or entry[1] != expected_version:
+                return None
+            self.insert(game_id, board, expected_version + 1)
+        return expected_version + 1
+
+    def spill(self, game_id: str):
+        with self.lock:
+            self.claim()
+            entry = self.games.get(game_id)
+            if entry is not None and self.save(game_id, entry[0], entry[1]):
+                del self.games[game_id]
+
+    def insert(self, game_id: str, board: chess.Board, version: int):
+        now = time.monotonic()
+        self.games[game_id] = (board, version, now)
+        self.games.move_to_end(game_id)
+
+        # Entries are kept in access order, so expired and least recently used ones are at the front
+        evicted = []
+        for old_id, (old_board, old_version, last_used) in self.games.items():
+            if len(self.games) - len(evicted) <= self.capacity and now - last_used < self.ttl:
+                break
+            if old_id != game_id:
+                evicted.append((old_id, old_board, old_version))
+        for old_id, old_board, old_version in evicted:
+            # A game that cannot be written stays in memory and is tried again on the next eviction
+            if self.save(old_id, old_board, old_version):
+                del self.games[old_id]
+                self.evictions += 1
+
+    def save(self, game_id: str, board: chess.Board, version: int) -> bool:
+        path = self.path(game_id)
+        if path is None:
+            return False
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(encode_game(board, version))
+            os.replace(tmp_path, path)
+        except OSError:
+            return False
+        self.spills += 1
+        return True
+
+    def discard(self, game_id: str):
+        path = self.path(game_id)
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def load(self, game_id: str) -> Optional[Tuple[chess.Board, int]]:
+        path = self.path(game_id)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return decode_game(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def iter_games(self) -> Iterator[Tuple[str, chess.Board]]:
+        # Games in memory first, then the ones that only exist on disk; files are read one at a time.
+        # Memory and directory are listed together under the lock, so every game is in one of them.
+        with self.lock:
+            self.claim()
+            in_memory = [(game_id, entry[0].copy()) for game_id, entry in self.games.items()]
+            names = os.listdir(self.directory)
+        yield from in_memory
+        seen = {game_id for game_id, _ in in_memory}
+        for name in names:
+            game_id, ext = os.path.splitext(name)
+            if ext != ".game" or game_id in seen:
+                continue
+            # A game rehydrated since the listing has lost its file but is back in memory
+            with self.lock:
+                entry = self.games.get(game_id)
+                loaded = (entry[0].copy(), entry[1]) if entry is not None else self.load(game_id)
+            if loaded is not None:
+                yield game_id, loaded[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.games),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "spills": self.spills,
+            "loads": self.loads,
+        }